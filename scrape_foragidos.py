@@ -1,157 +1,350 @@
-import re, time
+import argparse, asyncio, re, time
 import pandas as pd
 from urllib.parse import urljoin
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 
 URL = "https://seape.df.gov.br/foragidos/"
 SEL_CARD = ".product-grid-item-content"
 CSV_NAME = "foragidos.csv"
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/124.0.0.0 Safari/537.36")
+# só lemos atributos (src/title) e texto: o corpo desses recursos não é necessário.
+# CSS fica liberado: innerText depende dele (elementos ocultos, quebras de linha)
+BLOCKED_RESOURCES = {"image", "media", "font", "other"}
+# banners de cookies; os textos substituem os antigos button:has-text("Aceitar...")
+COOKIE_SELECTORS = ('#onetrust-accept-btn-handler',
+                    '.ot-sdk-container #onetrust-accept-btn-handler',
+                    '.cli-accept-all', '#cn-accept-cookie')
+COOKIE_TEXTS = ("aceitar",)
+# html_text: tags que quebram linha (como no innerText) e tags sem texto visível
+_BLOCK_TAGS = {"address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+               "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+               "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+               "tr", "ul"}
+_SKIP_TAGS = {"script", "style", "noscript", "template"}
+
+_WS_RE = re.compile(r"\s+")
+# 1º caractere ancorado em letra e repetição limitada: sem backtracking longo;
+# só espaço horizontal no miolo, já que o texto não passa mais por norm()
+_CIDADE_RE = re.compile(
+    r"Cidade\s*[:\-]?\s*([A-Za-zÁÀÂÃÉÊÍÓÔÕÚÇ][A-Za-zÁÀÂÃÉÊÍÓÔÕÚÇ \t\u00a0\-]{1,80})", re.I)
+# rótulos do card, em minúsculas; teste de substring no lugar de regex
+_LABEL_NEEDLES = ("prontuario", "prontuário", "cidade", "foragido desde", "visualizar",
+                  "clique aqui", "policia", "polícia", "penal", "dccp", "depate")
 
 def norm(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip())
+    return _WS_RE.sub(" ", (s or "").strip())
 
 def extract_cidade(texto: str):
-    m = re.search(r"Cidade\s*[:\-]?\s*([A-Za-zÁÀÂÃÉÊÍÓÔÕÚÇ\s\-]+)", norm(texto), flags=re.I)
-    return norm(m.group(1)) if m else None
-
-def try_accept_cookies(page):
-    for sel in (
-        '#onetrust-accept-btn-handler',
-        '.ot-sdk-container #onetrust-accept-btn-handler',
-        '.cli-accept-all', '#cn-accept-cookie',
-        'button:has-text("Aceitar")', 'button:has-text("ACEITAR")',
-        'button:has-text("Aceitar todos")'
-    ):
-        try:
-            page.locator(sel).first.click(timeout=1200)
-            page.wait_for_timeout(250)
-            break
-        except Exception:
-            pass
+    # a regex já aceita \s: normaliza só o trecho capturado
+    if not texto: return None
+    m = _CIDADE_RE.search(texto)
+    if not m: return None
+    return _WS_RE.sub(" ", m.group(1).strip())
+
+async def try_accept_cookies(page):
+    # um único round-trip: clica no primeiro banner encontrado (ids/classes, depois texto do botão)
+    try:
+        hit = await page.evaluate("""([sels, texts]) => {
+            for (const s of sels) {
+                const el = document.querySelector(s);
+                if (el) { el.click(); return s; }
+            }
+            for (const b of document.querySelectorAll('button')) {
+                const t = (b.textContent || '').trim();
+                if (texts.some(x => t.toLowerCase().includes(x))) { b.click(); return `button "${t}"`; }
+            }
+            return null;
+        }""", [COOKIE_SELECTORS, COOKIE_TEXTS])
+    except Exception:
+        hit = None
+    if hit:
+        print(f"🍪 Cookies aceitos via {hit}")
+        await page.wait_for_timeout(250)
 
-def js_count(page, selector: str) -> int:
+async def js_count(page, selector: str) -> int:
     try:
-        return page.evaluate("s => document.querySelectorAll(s).length", selector)
+        return await page.evaluate("s => document.querySelectorAll(s).length", selector)
     except Exception:
         return 0
 
-def auto_scroll(page, rounds=80, pause_ms=650):
-    last = -1
+async def block_heavy(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def wait_ready(page, selector=SEL_CARD, poll_ms=100, max_ms=30000):
+    # sai assim que o DOM estiver interativo ou o seletor já existir
+    waited = 0
+    while waited < max_ms:
+        try:
+            if await page.evaluate("""(sel) => document.readyState !== 'loading'
+                                || !!document.querySelector(sel)""", selector):
+                return
+        except Exception:
+            pass  # contexto destruído durante a navegação
+        await page.wait_for_timeout(poll_ms)
+        waited += poll_ms
+
+async def install_mutation_tracker(page):
+    # marca o instante da última mutação do DOM (idempotente); a contagem de cards
+    # só é feita quando o DOM assenta, em wait_dom_idle
+    await page.evaluate("""() => {
+        if (window.__lastMutationTs !== undefined) return;
+        window.__lastMutationTs = Date.now();
+        new MutationObserver(() => { window.__lastMutationTs = Date.now(); })
+            .observe(document.body, {childList: true, subtree: true});
+    }""")
+
+async def wait_dom_idle(page, selector=SEL_CARD, idle_ms=300, poll_ms=100, max_ms=1000):
+    # devolve a contagem de cards no mesmo round-trip que detecta o DOM ocioso
+    # (None se estourar o tempo ou o contexto cair)
+    deadline = time.monotonic() + max_ms / 1000
+    while time.monotonic() < deadline:
+        try:
+            count = await page.evaluate("""([sel, idle]) => {
+                if (Date.now() - (window.__lastMutationTs || 0) < idle) return null;
+                return document.querySelectorAll(sel).length;
+            }""", [selector, idle_ms])
+        except Exception:
+            return None
+        if count is not None:
+            return count
+        await page.wait_for_timeout(poll_ms)
+    return None
+
+async def auto_scroll(page, rounds=80, pause_ms=100, max_pause_ms=500, budget_s=60):
+    # budget_s limita o total mesmo se alguma região da página nunca parar de mudar
+    deadline = time.monotonic() + budget_s
+    await install_mutation_tracker(page)
+    last = await js_count(page, SEL_CARD)
     stable = 0
+    pause = pause_ms
     for i in range(rounds):
-        cards = js_count(page, SEL_CARD)
-        if cards == last: stable += 1
-        else: stable = 0
+        await page.evaluate("window.scrollBy(0, Math.max(1200, window.innerHeight*1.5))")
+        await page.wait_for_timeout(pause)
+        cards = await wait_dom_idle(page)
+        if cards is None:
+            # DOM ainda mudando: conta ao vivo mesmo assim
+            cards = await js_count(page, SEL_CARD)
+        # backoff adaptativo: dobra a espera enquanto nada muda
+        if cards == last:
+            stable += 1
+            pause = min(pause * 2, max_pause_ms)
+        else:
+            stable = 0
+            pause = pause_ms
         last = cards
-        page.evaluate("window.scrollBy(0, Math.max(1200, window.innerHeight*1.5))")
-        page.wait_for_timeout(pause_ms)
-        if stable >= 6 and i >= 8:
+        if (stable >= 8 and i >= 8) or time.monotonic() >= deadline:
             break
-    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-    page.wait_for_timeout(900)
-
-def collect_from_cards(page):
-    rows = []
-    cards = page.locator(SEL_CARD)
-    for i in range(cards.count()):
-        card = cards.nth(i)
-        img = card.locator("img").first
-        src = img.get_attribute("src")
-        title = img.get_attribute("title")
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    await wait_dom_idle(page)
+
+async def collect_from_cards(page):
+    # um único round-trip: extrai src/title/texto de todos os cards de uma vez.
+    # innerText (e não textContent) porque as quebras de linha alimentam o fallback
+    # do nome e a regex da cidade; o layout é calculado uma vez só para o lote.
+    # A cidade já vem extraída pelo regex do V8; extract_cidade fica de fallback.
+    raw = await page.evaluate("""([sel, pat]) => {
+        const re = new RegExp(pat, 'i');
+        return Array.from(document.querySelectorAll(sel)).map(c => {
+            const img = c.querySelector('img');
+            const text = c.innerText || '';
+            const m = text.match(re);
+            return {src: img?.getAttribute('src') || null,
+                    title: img?.getAttribute('title') || null,
+                    cidade: m ? m[1].replace(/\\s+/g, ' ').trim() : null,
+                    text};
+        });
+    }""", [SEL_CARD, _CIDADE_RE.pattern])
+    return rows_from_cards(raw)
+
+def rows_from_cards(raw):
+    # raw: [{src, title, cidade?, text}] vindo do navegador ou do parser HTTP
+    ordem, nomes, cidades, fotos = [], [], [], []
+    for i, item in enumerate(raw):
+        src, title, txt = item["src"], item["title"], item["text"]
         foto_url = urljoin(URL, src) if src else None
         nome = title.title() if title else None
-        txt = card.inner_text(timeout=8000)
-        cidade = extract_cidade(txt)
+        # sem a chave "cidade" (parser HTTP) a regex roda aqui; null do V8 é resposta final
+        cidade = item["cidade"] if "cidade" in item else extract_cidade(txt)
         # fallback do nome pelo texto
         if not nome:
             linhas = [ln.strip() for ln in txt.splitlines() if ln.strip()]
-            limpas = [ln for ln in linhas if not re.search(
-                r"Prontu[aá]rio|Cidade|Foragido desde|Visualizar|Clique Aqui|Pol[ií]cia|Penal|DCCP|DEPATE",
-                ln, re.I)]
+            limpas = []
+            for ln in linhas:
+                low = ln.lower()
+                if any(n in low for n in _LABEL_NEEDLES): continue
+                limpas.append(ln)
             ups = [ln for ln in limpas if ln.isupper() and len(ln) >= 5]
             nome = (max(ups, key=len) if ups else (limpas[0] if limpas else None))
             if nome and nome.isupper(): nome = nome.title()
-        rows.append({"ordem": i+1, "nome": nome, "cidade": cidade, "foto_url": foto_url})
-    return rows
-
-def collect_from_images(page):
-    rows = []
-    imgs = page.locator('img[title], img[src*="imageminterno"]')
-    for i in range(imgs.count()):
-        img = imgs.nth(i)
-        src = img.get_attribute("src")
-        title = img.get_attribute("title")
-        foto_url = urljoin(URL, src) if src else None
-        texto = img.evaluate("""el => {
+        ordem.append(i+1); nomes.append(nome); cidades.append(cidade); fotos.append(foto_url)
+    return pd.DataFrame({"ordem": ordem, "nome": nomes, "cidade": cidades, "foto_url": fotos})
+
+async def collect_from_images(page):
+    ordem, nomes, cidades, fotos = [], [], [], []
+    raw = await page.evaluate("""([sel, pat]) => {
+        const re = new RegExp(pat, 'i');
+        return Array.from(document.querySelectorAll(sel)).map(el => {
             const card = el.closest('.product-grid-item-content');
-            return (card ? card.innerText : el.parentElement?.innerText) || '';
-        }""")
-        cidade = extract_cidade(texto or "")
+            const text = (card ? card.innerText : el.parentElement?.innerText) || '';
+            const m = text.match(re);
+            return {src: el.getAttribute('src'),
+                    title: el.getAttribute('title'),
+                    cidade: m ? m[1].replace(/\\s+/g, ' ').trim() : null,
+                    text};
+        });
+    }""", ['img[title], img[src*="imageminterno"]', _CIDADE_RE.pattern])
+    for i, item in enumerate(raw):
+        src, title, texto = item["src"], item["title"], item["text"]
+        foto_url = urljoin(URL, src) if src else None
+        cidade = item["cidade"]
         nome = title.title() if title else None
         if not (nome or cidade or foto_url): continue
-        rows.append({"ordem": i+1, "nome": nome, "cidade": cidade, "foto_url": foto_url})
-    return rows
+        ordem.append(i+1); nomes.append(nome); cidades.append(cidade); fotos.append(foto_url)
+    return pd.DataFrame({"ordem": ordem, "nome": nomes, "cidade": cidades, "foto_url": fotos})
+
+async def dump_dom(ctx, page):
+    # snapshot MHTML já serializado pelo Chromium; page.content() só como fallback
+    try:
+        cdp = await ctx.new_cdp_session(page)
+        snap = await cdp.send("Page.captureSnapshot", {"format": "mhtml"})
+        path, data = "debug.mhtml", snap["data"]
+    except Exception:
+        path, data = "debug.html", await page.content()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
 
-def main():
-    all_rows = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
+def html_text(node):
+    # aproxima innerText: texto inline na mesma linha, quebra só em blocos e <br>
+    parts = []
+    def walk(n):
+        for child in n.iter(include_text=True):
+            if child.tag == "-text":
+                parts.append(child.text(deep=False))
+            elif child.tag in _SKIP_TAGS:
+                continue
+            elif child.tag in _BLOCK_TAGS:
+                parts.append("\n"); walk(child); parts.append("\n")
+            else:
+                walk(child)
+    walk(node)
+    linhas = (norm(ln) for ln in "".join(parts).split("\n"))
+    return "\n".join(ln for ln in linhas if ln)
+
+def collect_http():
+    # caminho leve: só funciona se o servidor já entrega os cards no HTML
+    import httpx
+    from selectolax.lexbor import LexborHTMLParser
+
+    resp = httpx.get(URL, headers={"User-Agent": USER_AGENT, "Accept-Language": "pt-BR,pt;q=0.9"},
+                     timeout=30, follow_redirects=True)
+    resp.raise_for_status()
+    raw = []
+    for card in LexborHTMLParser(resp.text).css(SEL_CARD):
+        img = card.css_first("img")
+        attrs = img.attributes if img is not None else {}
+        raw.append({"src": attrs.get("src"), "title": attrs.get("title"),
+                    "text": html_text(card)})
+    return rows_from_cards(raw)
+
+def write_csv(df):
+    df.to_csv(CSV_NAME, index=False, encoding="utf-8", lineterminator="\n")
+
+async def main(via_home=True, strict_debug=False):
+    df = pd.DataFrame()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
             headless=True,
             args=['--no-sandbox','--disable-setuid-sandbox','--disable-dev-shm-usage',
-                  '--disable-gpu','--disable-blink-features=AutomationControlled']
+                  '--disable-gpu','--disable-blink-features=AutomationControlled',
+                  '--blink-settings=imagesEnabled=false','--disable-extensions']
         )
-        ctx = browser.new_context(
+        ctx = await browser.new_context(
             viewport={"width": 1366, "height": 2400},
-            user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/124.0.0.0 Safari/537.36"),
+            user_agent=USER_AGENT,
             locale="pt-BR",
             timezone_id="America/Sao_Paulo",
         )
+        # corta imagens, fontes, css etc. antes de sair da rede
+        await ctx.route("**/*", block_heavy)
         # “stealth” básico
-        ctx.add_init_script('Object.defineProperty(navigator, "webdriver", {get: () => undefined})')
-        ctx.add_init_script("""
+        await ctx.add_init_script('Object.defineProperty(navigator, "webdriver", {get: () => undefined})')
+        await ctx.add_init_script("""
             // mimetypes/plugins fake
             Object.defineProperty(navigator, 'plugins', {get: () => [1,2,3]});
             Object.defineProperty(navigator, 'languages', {get: () => ['pt-BR','pt','en-US','en']});
         """)
 
-        page = ctx.new_page()
-        # abre a home e força navegar para a rota exata da aba
-        page.goto("https://seape.df.gov.br/", wait_until="domcontentloaded", timeout=120000)
-        try:
-            page.locator('a[href$="/foragidos/"]').first.click(timeout=4000)
-            page.wait_for_url("**/foragidos/**", timeout=10000)
-        except Exception:
-            page.goto(URL, wait_until="domcontentloaded", timeout=120000)
+        page = await ctx.new_page()
+        # vale também para screenshot: chamadas lentas passam timeout próprio
+        page.set_default_timeout(8000)
+        page.set_default_navigation_timeout(120000)
+        if via_home:
+            # abre a home e força navegar para a rota exata da aba
+            await page.goto("https://seape.df.gov.br/", wait_until="commit")
+            await wait_ready(page)
+            try:
+                await page.locator('a[href$="/foragidos/"]').first.click(timeout=4000)
+                await page.wait_for_url("**/foragidos/**", wait_until="commit", timeout=10000)
+            except Exception:
+                await page.goto(URL, wait_until="commit")
+        else:
+            await page.goto(URL, wait_until="commit")
+        await wait_ready(page)
 
-        try_accept_cookies(page)
+        await try_accept_cookies(page)
 
         # aguarda algo do card existir e rola
         try:
-            page.wait_for_selector(SEL_CARD, state="attached", timeout=60000)
+            await page.wait_for_selector(SEL_CARD, state="attached", timeout=30000)
         except PWTimeout:
             pass
-        auto_scroll(page)
+        await auto_scroll(page)
 
-        # tenta pelos cards
-        if page.locator(SEL_CARD).count() > 0:
-            all_rows = collect_from_cards(page)
+        # tenta pelos cards (frame vazio se não houver nenhum)
+        df = await collect_from_cards(page)
 
         # fallback por imagens
-        if not all_rows:
-            all_rows = collect_from_images(page)
-
-        # saída
-        pd.DataFrame(all_rows).to_csv(CSV_NAME, index=False, encoding="utf-8")
-        print(f"✅ CSV salvo: {CSV_NAME} | {len(all_rows)} registros")
+        if df.empty:
+            df = await collect_from_images(page)
 
-        # artefatos de debug
-        with open("debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        page.screenshot(path="debug.png", full_page=True)
+        # saída; artefatos de debug só quando nada foi coletado (ou se pedidos)
+        loop = asyncio.get_running_loop()
+        if df.empty or strict_debug:
+            # falha nos artefatos de debug não pode derrubar o CSV nem o fechamento
+            dom_err, png_err, csv_err = await asyncio.gather(
+                dump_dom(ctx, page),
+                page.screenshot(path="debug.png", full_page=True, timeout=30000),
+                loop.run_in_executor(None, write_csv, df),
+                return_exceptions=True,
+            )
+            for nome, err in (("debug DOM", dom_err), ("debug.png", png_err)):
+                if isinstance(err, Exception):
+                    print(f"⚠️ Falha ao gerar {nome}: {err!r}")
+            if isinstance(csv_err, Exception):
+                raise csv_err
+        else:
+            await loop.run_in_executor(None, write_csv, df)
+        print(f"✅ CSV salvo: {CSV_NAME} | {len(df)} registros")
 
-        ctx.close(); browser.close()
+        await ctx.close(); await browser.close()
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--http-only", action="store_true",
+                    help="baixa o HTML com httpx e parseia com selectolax, sem Chromium")
+    ap.add_argument("--direct", action="store_true",
+                    help="abre direto a URL dos foragidos, sem passar pela home")
+    ap.add_argument("--strict-debug", action="store_true",
+                    help="gera debug.mhtml/debug.png mesmo quando há registros")
+    args = ap.parse_args()
+    if args.http_only:
+        df = collect_http()
+        write_csv(df)
+        print(f"✅ CSV salvo (http): {CSV_NAME} | {len(df)} registros")
+    else:
+        asyncio.run(main(via_home=not args.direct, strict_debug=args.strict_debug))